@@ -1,16 +1,33 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import BaseModel, Field, TypeAdapter
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 import asyncio
+import time
+import orjson
 
+from app.config import settings
 from app.services.session_manager import session_manager
-from app.services.anthropic_client import AnthropicService
+from app.services.anthropic_client import anthropic_service
 from app.services.thinking_parser import ThinkingParser
 from app.services.websocket_manager import websocket_manager
+from app.models.thought_node import ThoughtNode
 
 router = APIRouter(prefix="/api", tags=["api"])
 
+# Serializer for thought nodes, built once instead of per streamed node
+_NODE_ADAPTER = TypeAdapter(ThoughtNode)
+
+# Coalescing window and cap for batched new-thought broadcasts
+_FLUSH_INTERVAL_SECONDS = 0.02
+_FLUSH_MAX_BATCH = 32
+
+# Global cap on concurrently running analyses; extra ones wait their turn
+_ANALYSIS_SEMAPHORE = asyncio.Semaphore(settings.max_concurrent_analyses)
+
+# Strong references to running analysis tasks so they aren't garbage collected
+_analysis_tasks: set = set()
+
 
 # Request/Response Models
 class AnalyzeRequest(BaseModel):
@@ -51,6 +68,49 @@ class FeedbackRequest(BaseModel):
     comment: Optional[str] = Field(None, max_length=1000)
 
 
+class FeedbackResponse(BaseModel):
+    """Response model for feedback submission."""
+    message: str
+    session_id: str
+
+
+# Curated example problems, encoded once at import
+_EXAMPLES = [
+    ExampleProblem(
+        title="LRU Cache Implementation",
+        description="Design and implement a data structure for a Least Recently Used (LRU) cache",
+        problem_text="Design and implement a data structure for a Least Recently Used (LRU) cache. It should support get and put operations. get(key) should return the value of the key if it exists, otherwise return -1. put(key, value) should insert or update the value. When the cache reaches its capacity, it should invalidate the least recently used item before inserting a new item. Both operations should run in O(1) time complexity.",
+        difficulty="medium"
+    ),
+    ExampleProblem(
+        title="Binary Search Tree Validation",
+        description="Determine if a binary tree is a valid binary search tree",
+        problem_text="Given the root of a binary tree, determine if it is a valid binary search tree (BST). A valid BST is defined as follows: The left subtree of a node contains only nodes with keys less than the node's key. The right subtree of a node contains only nodes with keys greater than the node's key. Both the left and right subtrees must also be binary search trees.",
+        difficulty="medium"
+    ),
+    ExampleProblem(
+        title="Two Sum Problem",
+        description="Find two numbers that add up to a target value",
+        problem_text="Given an array of integers nums and an integer target, return indices of the two numbers such that they add up to target. You may assume that each input would have exactly one solution, and you may not use the same element twice. You can return the answer in any order.",
+        difficulty="easy"
+    ),
+    ExampleProblem(
+        title="Merge Intervals",
+        description="Merge overlapping intervals in a collection",
+        problem_text="Given an array of intervals where intervals[i] = [start_i, end_i], merge all overlapping intervals, and return an array of the non-overlapping intervals that cover all the intervals in the input.",
+        difficulty="medium"
+    ),
+    ExampleProblem(
+        title="Longest Palindromic Substring",
+        description="Find the longest palindromic substring in a given string",
+        problem_text="Given a string s, return the longest palindromic substring in s. A palindrome is a string that reads the same backward as forward. For example, 'racecar' is a palindrome.",
+        difficulty="medium"
+    )
+]
+
+_EXAMPLES_JSON = orjson.dumps([example.model_dump() for example in _EXAMPLES])
+
+
 # Helper function to get client IP
 def get_client_ip(request: Request) -> str:
     """Extract client IP address from request."""
@@ -59,6 +119,41 @@ def get_client_ip(request: Request) -> str:
     return "unknown"
 
 
+async def _flush_loop(queue: asyncio.Queue, session_id: str):
+    """
+    Coalesce queued thought nodes into batched broadcasts.
+    
+    Waits for a node, lets more accumulate for a short window, then sends
+    everything queued as a single new_thoughts event. A None item flushes
+    what is pending and stops the loop.
+    
+    Args:
+        queue: Queue of JSON-encoded thought nodes
+        session_id: Session identifier
+    """
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        
+        # Give the stream a moment to produce more nodes
+        await asyncio.sleep(_FLUSH_INTERVAL_SECONDS)
+        
+        batch = [item]
+        stop = False
+        while not queue.empty() and len(batch) < _FLUSH_MAX_BATCH:
+            item = queue.get_nowait()
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        
+        await websocket_manager.broadcast_new_thoughts_batch(session_id, batch)
+        
+        if stop:
+            return
+
+
 # Background task for analysis
 async def run_analysis(session_id: str, problem_text: str):
     """
@@ -68,6 +163,12 @@ async def run_analysis(session_id: str, problem_text: str):
         session_id: Session identifier
         problem_text: Problem to analyze
     """
+    queue: asyncio.Queue = asyncio.Queue()
+    flusher = asyncio.create_task(_flush_loop(queue, session_id))
+    
+    # Latest reported usage; written to the session once the analysis ends
+    usage_state = {'tokens_used': 0}
+    
     try:
         # Update session status
         session_manager.update_session(session_id, status="streaming", problem_text=problem_text)
@@ -75,36 +176,34 @@ async def run_analysis(session_id: str, problem_text: str):
         # Initialize parser
         parser = ThinkingParser(session_id)
         
-        # Initialize Anthropic service
-        anthropic_service = AnthropicService()
-        
         # Track start time
-        start_time = datetime.utcnow()
+        start_time = time.monotonic()
         
         # Define callback for thinking chunks
         async def on_thinking_chunk(sess_id: str, chunk: str):
             """Process thinking chunk through parser and broadcast."""
-            async for thought_node in parser.parse_incremental(chunk):
-                # Convert to dict
-                node_dict = thought_node.model_dump(mode='json')
-                
-                # Store in session
+            # Parse off the event loop so streaming and other requests stay responsive
+            thought_nodes = await asyncio.to_thread(parser.parse_incremental_sync, chunk)
+            for thought_node in thought_nodes:
+                # Store in session as a dict
+                node_dict = _NODE_ADAPTER.dump_python(thought_node, mode='json')
                 session_manager.add_thought_node(sess_id, node_dict)
                 
-                # Broadcast to WebSocket clients
-                await websocket_manager.broadcast_new_thought(sess_id, node_dict)
+                # Queue JSON bytes straight from Pydantic for the next batched broadcast
+                queue.put_nowait(_NODE_ADAPTER.dump_json(thought_node))
         
         # Define callback for token usage
         async def on_token_usage(usage: dict):
-            """Update session with token usage."""
-            session_manager.update_session(
-                session_id,
-                tokens_used=usage.get('output_tokens', 0)
-            )
+            """Record latest token usage."""
+            usage_state['tokens_used'] = usage.get('output_tokens', 0)
         
         # Define callback for errors
         async def on_error(error_msg: str):
             """Broadcast error to clients."""
+            # Deliver nodes parsed before the failure ahead of the error event
+            if not flusher.done():
+                queue.put_nowait(None)
+                await flusher
             await websocket_manager.broadcast_error(session_id, error_msg, "api_error")
         
         # Define callback for solution
@@ -123,13 +222,17 @@ async def run_analysis(session_id: str, problem_text: str):
         )
         
         # Finalize any remaining parsed thoughts
-        async for thought_node in parser.finalize():
-            node_dict = thought_node.model_dump(mode='json')
+        for thought_node in await asyncio.to_thread(parser.finalize_sync):
+            node_dict = _NODE_ADAPTER.dump_python(thought_node, mode='json')
             session_manager.add_thought_node(session_id, node_dict)
-            await websocket_manager.broadcast_new_thought(session_id, node_dict)
+            queue.put_nowait(_NODE_ADAPTER.dump_json(thought_node))
+        
+        # Flush remaining nodes before announcing completion
+        queue.put_nowait(None)
+        await flusher
         
         # Calculate duration
-        duration = (datetime.utcnow() - start_time).total_seconds()
+        duration = time.monotonic() - start_time
         
         # Update session
         session_manager.update_session(
@@ -138,15 +241,19 @@ async def run_analysis(session_id: str, problem_text: str):
             tokens_used=result.get('usage', {}).get('output_tokens', 0)
         )
         
-        # Broadcast thinking complete
+        # Read the node count before any await; the session may be swept and
+        # its object reused while the broadcasts below are in flight
         session = session_manager.get_session(session_id)
+        thought_count = len(session.thought_nodes) if session else 0
+        
+        # Broadcast thinking complete
         await websocket_manager.broadcast_thinking_complete(
             session_id,
             {
-                "total_thoughts": len(session.thought_nodes) if session else 0,
+                "total_thoughts": thought_count,
                 "total_tokens": result.get('usage', {}).get('output_tokens', 0),
                 "duration_seconds": duration,
-                "summary": f"Completed analysis with {len(session.thought_nodes) if session else 0} thought nodes"
+                "summary": f"Completed analysis with {thought_count} thought nodes"
             }
         )
         
@@ -156,7 +263,7 @@ async def run_analysis(session_id: str, problem_text: str):
                 session_id,
                 {
                     "solution_text": result['solution_text'],
-                    "thinking_node_count": len(session.thought_nodes) if session else 0
+                    "thinking_node_count": thought_count
                 }
             )
     
@@ -166,15 +273,37 @@ async def run_analysis(session_id: str, problem_text: str):
         session_manager.update_session(
             session_id,
             status="error",
-            error_message=error_msg
+            error_message=error_msg,
+            tokens_used=usage_state['tokens_used']
         )
+        
+        # Deliver nodes parsed before the failure
+        if not flusher.done():
+            queue.put_nowait(None)
+            await flusher
+        
         await websocket_manager.broadcast_error(session_id, error_msg, "analysis_error")
+    
+    finally:
+        if not flusher.done():
+            flusher.cancel()
+
+
+async def _launch_analysis(session_id: str, problem_text: str):
+    """
+    Run an analysis once a concurrency slot is available.
+    
+    Args:
+        session_id: Session identifier
+        problem_text: Problem to analyze
+    """
+    async with _ANALYSIS_SEMAPHORE:
+        await run_analysis(session_id, problem_text)
 
 
 @router.post("/analyze", response_model=AnalyzeResponse)
 async def start_analysis(
     request: AnalyzeRequest,
-    background_tasks: BackgroundTasks,
     http_request: Request
 ):
     """
@@ -182,7 +311,6 @@ async def start_analysis(
     
     Args:
         request: Analysis request with problem text
-        background_tasks: FastAPI background tasks
         http_request: HTTP request object
         
     Returns:
@@ -195,11 +323,10 @@ async def start_analysis(
         # Create session (with rate limiting)
         session = session_manager.create_session(ip_address)
         
-        # Start analysis in background
-        background_tasks.add_task(run_analysis, session.session_id, request.problem)
-        
-        # Clean up old sessions in background
-        background_tasks.add_task(session_manager.cleanup_old_sessions)
+        # Start analysis as an independent task, outside the request lifecycle
+        task = asyncio.create_task(_launch_analysis(session.session_id, request.problem))
+        _analysis_tasks.add(task)
+        task.add_done_callback(_analysis_tasks.discard)
         
         return AnalyzeResponse(
             session_id=session.session_id,
@@ -233,7 +360,7 @@ async def get_session_status(session_id: str):
         status=session.status,
         thought_count=len(session.thought_nodes),
         tokens_used=session.tokens_used,
-        created_at=session.created_at.isoformat(),
+        created_at=session.created_at_iso,
         has_solution=bool(session.solution_text),
         error_message=session.error_message
     )
@@ -247,43 +374,10 @@ async def get_examples():
     Returns:
         List of example problems
     """
-    examples = [
-        ExampleProblem(
-            title="LRU Cache Implementation",
-            description="Design and implement a data structure for a Least Recently Used (LRU) cache",
-            problem_text="Design and implement a data structure for a Least Recently Used (LRU) cache. It should support get and put operations. get(key) should return the value of the key if it exists, otherwise return -1. put(key, value) should insert or update the value. When the cache reaches its capacity, it should invalidate the least recently used item before inserting a new item. Both operations should run in O(1) time complexity.",
-            difficulty="medium"
-        ),
-        ExampleProblem(
-            title="Binary Search Tree Validation",
-            description="Determine if a binary tree is a valid binary search tree",
-            problem_text="Given the root of a binary tree, determine if it is a valid binary search tree (BST). A valid BST is defined as follows: The left subtree of a node contains only nodes with keys less than the node's key. The right subtree of a node contains only nodes with keys greater than the node's key. Both the left and right subtrees must also be binary search trees.",
-            difficulty="medium"
-        ),
-        ExampleProblem(
-            title="Two Sum Problem",
-            description="Find two numbers that add up to a target value",
-            problem_text="Given an array of integers nums and an integer target, return indices of the two numbers such that they add up to target. You may assume that each input would have exactly one solution, and you may not use the same element twice. You can return the answer in any order.",
-            difficulty="easy"
-        ),
-        ExampleProblem(
-            title="Merge Intervals",
-            description="Merge overlapping intervals in a collection",
-            problem_text="Given an array of intervals where intervals[i] = [start_i, end_i], merge all overlapping intervals, and return an array of the non-overlapping intervals that cover all the intervals in the input.",
-            difficulty="medium"
-        ),
-        ExampleProblem(
-            title="Longest Palindromic Substring",
-            description="Find the longest palindromic substring in a given string",
-            problem_text="Given a string s, return the longest palindromic substring in s. A palindrome is a string that reads the same backward as forward. For example, 'racecar' is a palindrome.",
-            difficulty="medium"
-        )
-    ]
-    
-    return examples
+    return Response(content=_EXAMPLES_JSON, media_type="application/json")
 
 
-@router.post("/feedback")
+@router.post("/feedback", response_model=FeedbackResponse)
 async def submit_feedback(feedback: FeedbackRequest):
     """
     Accept user feedback for a session (logged to console for demo).
@@ -306,7 +400,7 @@ async def submit_feedback(feedback: FeedbackRequest):
     print(f"Session ID: {feedback.session_id}")
     print(f"Rating: {feedback.rating}/5")
     print(f"Comment: {feedback.comment or 'No comment provided'}")
-    print(f"Timestamp: {datetime.utcnow().isoformat()}")
+    print(f"Timestamp: {datetime.now(timezone.utc).isoformat()}")
     print(f"{'='*60}\n")
     
     return {
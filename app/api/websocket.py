@@ -1,4 +1,4 @@
-from fastapi import WebSocket, WebSocketDisconnect, APIRouter
+from fastapi import WebSocket, APIRouter
 from app.services.websocket_manager import websocket_manager
 
 router = APIRouter()
@@ -17,14 +17,11 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     await websocket_manager.connect(session_id, websocket)
     
     try:
-        # Keep connection alive and listen for disconnects
+        # Server->client only: wait on raw ASGI messages purely to detect the
+        # disconnect, without decoding any client frames
         while True:
-            # Wait for any message from client (mostly just to detect disconnect)
-            try:
-                data = await websocket.receive_text()
-                # Echo back or handle client messages if needed
-                # For now, we only stream server->client, so just acknowledge
-            except WebSocketDisconnect:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
                 break
     except Exception as e:
         # Handle any other errors
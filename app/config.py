@@ -1,5 +1,6 @@
+from functools import cached_property
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Tuple
 
 
 class Settings(BaseSettings):
@@ -15,15 +16,16 @@ class Settings(BaseSettings):
     thinking_budget_tokens: int = 10000
     session_cleanup_hours: int = 1
     max_concurrent_sessions_per_ip: int = 3
+    max_concurrent_analyses: int = 10
     
     class Config:
         env_file = ".env"
         case_sensitive = False
     
-    @property
-    def cors_origins_list(self) -> List[str]:
-        """Parse CORS origins string into a list."""
-        return [origin.strip() for origin in self.cors_origins.split(",")]
+    @cached_property
+    def cors_origins_list(self) -> Tuple[str, ...]:
+        """Parse CORS origins string into a tuple (parsed once, then cached)."""
+        return tuple(origin.strip() for origin in self.cors_origins.split(","))
 
 
 # Global settings instance
@@ -1,13 +1,61 @@
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 from fastapi import FastAPI
+from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.api import websocket, routes
+from app.services.session_manager import session_manager
+from app.services.anthropic_client import anthropic_service
+
+logger = logging.getLogger(__name__)
+
+# Shortest pause between sweeps, so a zero cleanup window can't spin the loop
+_MIN_CLEANUP_INTERVAL_SECONDS = 60
+
+
+async def _periodic_cleanup():
+    """Sweep expired sessions on a fixed interval for the app's lifetime."""
+    # Sweep 60 times per session lifetime (every minute for the 1 hour default)
+    interval_seconds = max(_MIN_CLEANUP_INTERVAL_SECONDS, settings.session_cleanup_hours * 60)
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            session_manager.cleanup_old_sessions()
+        except Exception:
+            # Keep sweeping; one bad pass must not stop cleanup for good
+            logger.exception("Session cleanup sweep failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background maintenance on startup and stop it on shutdown."""
+    cleanup_task = asyncio.create_task(_periodic_cleanup())
+    yield
+    cleanup_task.cancel()
+
+    # Stop in-flight analyses before closing the client they stream on
+    analysis_tasks = list(routes._analysis_tasks)
+    for task in analysis_tasks:
+        task.cancel()
+    await asyncio.gather(*analysis_tasks, return_exceptions=True)
+
+    await anthropic_service.client.close()
+
+
+class HealthResponse(BaseModel):
+    """Response model for the health check."""
+    status: str
+    version: str
+
 
 # Initialize FastAPI application
 app = FastAPI(
     title="Claude Thinking Visualizer API",
     description="Backend API for real-time streaming and parsing of Claude's extended thinking",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS middleware
@@ -26,7 +74,7 @@ app.include_router(routes.router)
 app.include_router(websocket.router)
 
 
-@app.get("/api/health")
+@app.get("/api/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint to verify the API is running."""
     return {
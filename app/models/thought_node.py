@@ -1,7 +1,7 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Tuple
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, computed_field
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from enum import Enum
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 class ThoughtType(Enum):
@@ -30,12 +30,18 @@ class ThoughtNode(BaseModel):
     confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score 0.0-1.0")
     keywords: List[str] = Field(default_factory=list, description="Key terms extracted from content")
     dependencies: List[str] = Field(default_factory=list, description="IDs of nodes this thought depends on")
-    position: Position = Field(..., description="Position for graph layout")
-    timestamp: datetime = Field(default_factory=datetime.utcnow, description="When this thought was created")
+    pos_x: float = Field(0.0, exclude=True, description="Layout x coordinate")
+    pos_y: float = Field(0.0, exclude=True, description="Layout y coordinate")
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="When this thought was created")
     session_id: str = Field(..., description="Session this thought belongs to")
     
-    class Config:
-        json_schema_extra = {
+    # Keywords as a set, built once for repeated dependency comparisons (not serialized)
+    _keyword_set: FrozenSet[str] = PrivateAttr(default_factory=frozenset)
+    
+    model_config = ConfigDict(
+        extra="ignore",
+        validate_assignment=False,
+        json_schema_extra={
             "example": {
                 "id": "node_abc123",
                 "type": "analysis",
@@ -48,6 +54,13 @@ class ThoughtNode(BaseModel):
                 "session_id": "session_xyz"
             }
         }
+    )
+    
+    @computed_field(description="Position for graph layout")
+    @property
+    def position(self) -> Dict[str, float]:
+        """Position in the serialized shape of Position, built only on dump."""
+        return {"x": self.pos_x, "y": self.pos_y, "z": 0.0}
 
 
 class WebSocketEvent(BaseModel):
@@ -55,7 +68,7 @@ class WebSocketEvent(BaseModel):
     event_type: str = Field(..., description="Type of event: new_thought, thinking_complete, solution_ready, error")
     session_id: str = Field(..., description="Session identifier")
     data: dict = Field(..., description="Event payload")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 class ThinkingCompleteEvent(BaseModel):
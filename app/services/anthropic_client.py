@@ -1,8 +1,85 @@
 from anthropic import Anthropic, AsyncAnthropic
-from typing import Callable, Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, List
 import asyncio
+import logging
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+
+class _StreamState:
+    """Mutable state shared by the stream event handlers during one analysis."""
+    
+    def __init__(
+        self,
+        session_id: str,
+        on_thinking_chunk: Optional[Callable[[str, str], None]],
+        on_token_usage: Optional[Callable[[Dict[str, int]], None]]
+    ):
+        self.session_id = session_id
+        self.on_thinking_chunk = on_thinking_chunk
+        self.on_token_usage = on_token_usage
+        self.thinking_parts: List[str] = []
+        self.solution_parts: List[str] = []
+        self.thinking_signature: Dict[str, Any] = {}
+        self.malformed_deltas = 0
+
+
+async def _on_content_block_start(event, state: _StreamState):
+    """Capture the thinking block signature fields."""
+    block = event.content_block
+    if getattr(block, 'type', None) == 'thinking':
+        state.thinking_signature = {
+            'type': 'thinking',
+            'index': event.index
+        }
+
+
+async def _on_content_block_delta(event, state: _StreamState):
+    """Accumulate thinking/solution text and forward thinking chunks."""
+    delta = event.delta
+    delta_type = getattr(delta, 'type', None)
+    
+    try:
+        if delta_type == 'thinking_delta':
+            chunk = delta.thinking
+        elif delta_type == 'text_delta':
+            chunk = delta.text
+        else:
+            return
+    except AttributeError:
+        # Skip malformed deltas; log the first and count the rest
+        if not state.malformed_deltas:
+            logger.warning("Skipping malformed %s in session %s", delta_type, state.session_id)
+        state.malformed_deltas += 1
+        return
+    
+    if delta_type == 'thinking_delta':
+        state.thinking_parts.append(chunk)
+        
+        # Send chunk to parser in real-time if callback provided
+        if state.on_thinking_chunk:
+            await state.on_thinking_chunk(state.session_id, chunk)
+    else:
+        state.solution_parts.append(chunk)
+
+
+async def _on_message_delta(event, state: _StreamState):
+    """Report output token usage."""
+    usage = getattr(event, 'usage', None)
+    if usage and state.on_token_usage:
+        await state.on_token_usage({
+            'output_tokens': getattr(usage, 'output_tokens', 0)
+        })
+
+
+# Stream event type -> handler; other event types are ignored
+_EVENT_HANDLERS = {
+    "content_block_start": _on_content_block_start,
+    "content_block_delta": _on_content_block_delta,
+    "message_delta": _on_message_delta,
+}
+
 
 class AnthropicService:
     """Service for interacting with Anthropic's Claude API with streaming support."""
@@ -37,10 +114,7 @@ class AnthropicService:
             Dictionary containing analysis results and metadata
         """
         try:
-            # Accumulate full thinking and solution text
-            full_thinking = ""
-            full_solution = ""
-            thinking_signature = {}
+            state = _StreamState(session_id, on_thinking_chunk, on_token_usage)
             
             # Create streaming request
             async with self.client.messages.stream(
@@ -57,58 +131,22 @@ class AnthropicService:
             ) as stream:
                 # Process streaming events
                 async for event in stream:
-                    try:
-                        # Handle content block start - captures thinking signature
-                        if event.type == "content_block_start":
-                            block = event.content_block
-                            if hasattr(block, 'type') and block.type == 'thinking':
-                                # Preserve signature fields from thinking block
-                                thinking_signature = {
-                                    'type': block.type,
-                                    'index': event.index
-                                }
-                        
-                        # Handle content block delta - accumulate text
-                        elif event.type == "content_block_delta":
-                            delta = event.delta
-                            if hasattr(delta, 'type'):
-                                if delta.type == 'thinking_delta':
-                                    # Accumulate thinking text
-                                    chunk = delta.thinking
-                                    full_thinking += chunk
-                                    
-                                    # Send chunk to parser in real-time if callback provided
-                                    if on_thinking_chunk:
-                                        await on_thinking_chunk(session_id, chunk)
-                                
-                                elif delta.type == 'text_delta':
-                                    # Accumulate solution text
-                                    chunk = delta.text
-                                    full_solution += chunk
-                        
-                        # Handle content block stop
-                        elif event.type == "content_block_stop":
-                            pass  # Finalize current block
-                        
-                        # Handle message delta - track token usage
-                        elif event.type == "message_delta":
-                            if hasattr(event, 'usage') and event.usage:
-                                usage_dict = {
-                                    'output_tokens': getattr(event.usage, 'output_tokens', 0)
-                                }
-                                if on_token_usage:
-                                    await on_token_usage(usage_dict)
-                    
-                    except Exception as chunk_error:
-                        # Skip problematic chunks but continue processing
-                        error_msg = f"Error processing stream chunk: {str(chunk_error)}"
-                        if on_error:
-                            await on_error(error_msg)
-                        continue
+                    handler = _EVENT_HANDLERS.get(event.type)
+                    if handler:
+                        await handler(event, state)
+                
+                if state.malformed_deltas:
+                    logger.warning(
+                        "Skipped %d malformed deltas in session %s",
+                        state.malformed_deltas, session_id
+                    )
                 
                 # Get final message for complete token usage
                 final_message = await stream.get_final_message()
                 
+                full_thinking = "".join(state.thinking_parts)
+                full_solution = "".join(state.solution_parts)
+                
                 # Send final solution if callback provided
                 if on_solution and full_solution:
                     await on_solution(full_solution)
@@ -117,7 +155,7 @@ class AnthropicService:
                     'session_id': session_id,
                     'thinking_text': full_thinking,
                     'solution_text': full_solution,
-                    'thinking_signature': thinking_signature,
+                    'thinking_signature': state.thinking_signature,
                     'usage': {
                         'input_tokens': final_message.usage.input_tokens,
                         'output_tokens': final_message.usage.output_tokens,
@@ -135,3 +173,6 @@ class AnthropicService:
             # Re-raise for upstream handling
             raise Exception(error_msg) from e
 
+
+# Global Anthropic service instance; its client pools connections across analyses
+anthropic_service = AnthropicService()
@@ -1,30 +1,97 @@
-import uuid
-from typing import Dict, Optional, List, Any
-from datetime import datetime, timedelta
-from collections import defaultdict
+import heapq
+import secrets
+import time
+from typing import ClassVar, Dict, Optional, List, Set, Tuple, Any
+from datetime import datetime, timezone
+from collections import Counter, defaultdict
 from app.config import settings
 
+# Upper bound on recycled Session objects kept for reuse
+_SESSION_POOL_MAX = 1024
+
 
 class Session:
     """Represents an analysis session."""
     
+    # Fixed attribute layout instead of a per-instance __dict__
+    __slots__ = (
+        "session_id",
+        "ip_address",
+        "status",
+        "created_at",
+        "thought_nodes",
+        "tokens_used",
+        "problem_text",
+        "solution_text",
+        "error_message",
+    )
+    
+    # Released sessions waiting to be reused by acquire()
+    _pool: ClassVar[List["Session"]] = []
+    
     def __init__(self, session_id: str, ip_address: str):
+        self._reset(session_id, ip_address)
+    
+    def _reset(self, session_id: str, ip_address: str):
+        """
+        (Re)initialize every field for a new session.
+        
+        Args:
+            session_id: Unique session identifier
+            ip_address: Client IP address
+        """
         self.session_id = session_id
         self.ip_address = ip_address
         self.status = "initializing"  # initializing, streaming, completed, error
-        self.created_at = datetime.utcnow()
+        self.created_at = time.time()  # Unix timestamp; cheap to compare during cleanup
         self.thought_nodes: List[dict] = []
         self.tokens_used = 0
         self.problem_text = ""
         self.solution_text = ""
         self.error_message: Optional[str] = None
     
+    @classmethod
+    def acquire(cls, session_id: str, ip_address: str) -> "Session":
+        """
+        Get a session, reusing a released one when available.
+        
+        Args:
+            session_id: Unique session identifier
+            ip_address: Client IP address
+            
+        Returns:
+            Freshly initialized Session object
+        """
+        if cls._pool:
+            session = cls._pool.pop()
+            session._reset(session_id, ip_address)
+            return session
+        return cls(session_id, ip_address)
+    
+    def release(self):
+        """
+        Drop this session's data and return it to the pool.
+        
+        The caller must not use the session afterwards.
+        """
+        self.thought_nodes = []
+        self.problem_text = ""
+        self.solution_text = ""
+        self.error_message = None
+        if len(Session._pool) < _SESSION_POOL_MAX:
+            Session._pool.append(self)
+    
+    @property
+    def created_at_iso(self) -> str:
+        """Creation time as a UTC ISO 8601 string."""
+        return datetime.fromtimestamp(self.created_at, timezone.utc).isoformat()
+    
     def to_dict(self) -> dict:
         """Convert session to dictionary."""
         return {
             "session_id": self.session_id,
             "status": self.status,
-            "created_at": self.created_at.isoformat(),
+            "created_at": self.created_at_iso,
             "thought_count": len(self.thought_nodes),
             "tokens_used": self.tokens_used,
             "problem_text": self.problem_text[:100] + "..." if len(self.problem_text) > 100 else self.problem_text,
@@ -43,8 +110,12 @@ class SessionManager:
         # Session storage: session_id -> Session
         self.sessions: Dict[str, Session] = {}
         
-        # IP tracking for rate limiting: ip_address -> list of active session_ids
-        self.ip_sessions: Dict[str, List[str]] = defaultdict(list)
+        # IP tracking for rate limiting: ip_address -> set of active session_ids
+        # (sessions leave the set when they complete, error out, or are cleaned up)
+        self.ip_sessions: Dict[str, Set[str]] = defaultdict(set)
+        
+        # Min-heap of (created_at, session_id) so cleanup only touches expired sessions
+        self._expiry_heap: List[Tuple[float, str]] = []
         
         # Configuration from settings
         self.max_concurrent_per_ip = settings.max_concurrent_sessions_per_ip
@@ -55,9 +126,9 @@ class SessionManager:
         Generate a unique session identifier.
         
         Returns:
-            Unique UUID4-based session ID
+            Unique session ID with 64 random bits as 16 hex characters
         """
-        return f"session_{uuid.uuid4().hex[:16]}"
+        return f"session_{secrets.token_hex(8)}"
     
     def create_session(self, ip_address: str) -> Session:
         """
@@ -73,19 +144,19 @@ class SessionManager:
             Exception: If rate limit exceeded
         """
         # Check rate limit
-        active_sessions = self._get_active_sessions_for_ip(ip_address)
-        if len(active_sessions) >= self.max_concurrent_per_ip:
+        if len(self.ip_sessions.get(ip_address, ())) >= self.max_concurrent_per_ip:
             raise Exception(
                 f"Rate limit exceeded: Maximum {self.max_concurrent_per_ip} concurrent sessions per IP"
             )
         
         # Generate session
         session_id = self.generate_session_id()
-        session = Session(session_id, ip_address)
+        session = Session.acquire(session_id, ip_address)
         
         # Store session
         self.sessions[session_id] = session
-        self.ip_sessions[ip_address].append(session_id)
+        self.ip_sessions[ip_address].add(session_id)
+        heapq.heappush(self._expiry_heap, (session.created_at, session_id))
         
         return session
     
@@ -116,6 +187,10 @@ class SessionManager:
         for key, value in kwargs.items():
             if hasattr(session, key):
                 setattr(session, key, value)
+        
+        # Finished sessions no longer count against the IP's concurrency limit
+        if kwargs.get("status") in ("completed", "error"):
+            self._release_ip_slot(session.ip_address, session_id)
     
     def add_thought_node(self, session_id: str, thought_node: dict):
         """
@@ -129,28 +204,19 @@ class SessionManager:
         if session:
             session.thought_nodes.append(thought_node)
     
-    def _get_active_sessions_for_ip(self, ip_address: str) -> List[str]:
+    def _release_ip_slot(self, ip_address: str, session_id: str):
         """
-        Get active session IDs for an IP address.
+        Stop counting a session against its IP's concurrency limit.
         
         Args:
             ip_address: Client IP address
-            
-        Returns:
-            List of active session IDs
+            session_id: Session identifier
         """
-        # Filter to only include sessions that still exist and aren't completed
-        active = []
-        for session_id in self.ip_sessions.get(ip_address, []):
-            session = self.sessions.get(session_id)
-            if session and session.status not in ["completed", "error"]:
-                active.append(session_id)
-        
-        # Update IP sessions list
-        if ip_address in self.ip_sessions:
-            self.ip_sessions[ip_address] = active
-        
-        return active
+        active = self.ip_sessions.get(ip_address)
+        if active is not None:
+            active.discard(session_id)
+            if not active:
+                del self.ip_sessions[ip_address]
     
     def cleanup_old_sessions(self) -> int:
         """
@@ -159,26 +225,22 @@ class SessionManager:
         Returns:
             Number of sessions cleaned up
         """
-        cutoff_time = datetime.utcnow() - timedelta(hours=self.cleanup_hours)
+        cutoff_time = time.time() - self.cleanup_hours * 3600
         
-        sessions_to_remove = []
-        for session_id, session in self.sessions.items():
-            if session.created_at < cutoff_time:
-                sessions_to_remove.append(session_id)
-        
-        # Remove old sessions
-        for session_id in sessions_to_remove:
-            session = self.sessions[session_id]
+        # Pop expired entries in creation order; stop at the first live one
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff_time:
+            _, session_id = heapq.heappop(self._expiry_heap)
+            session = self.sessions.pop(session_id, None)
+            if session is None:
+                continue
             
             # Remove from IP tracking
-            if session.ip_address in self.ip_sessions:
-                if session_id in self.ip_sessions[session.ip_address]:
-                    self.ip_sessions[session.ip_address].remove(session_id)
-            
-            # Remove session
-            del self.sessions[session_id]
+            self._release_ip_slot(session.ip_address, session_id)
+            session.release()
+            removed += 1
         
-        return len(sessions_to_remove)
+        return removed
     
     def get_session_count(self) -> int:
         """Get total number of active sessions."""
@@ -194,10 +256,7 @@ class SessionManager:
     
     def _get_status_breakdown(self) -> dict:
         """Get count of sessions by status."""
-        breakdown = defaultdict(int)
-        for session in self.sessions.values():
-            breakdown[session.status] += 1
-        return dict(breakdown)
+        return dict(Counter(session.status for session in self.sessions.values()))
 
 
 # Global session manager instance
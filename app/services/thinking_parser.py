@@ -1,14 +1,68 @@
 import re
 import uuid
-from typing import List, AsyncGenerator, Optional
-from app.models.thought_node import ThoughtNode, ThoughtType, Position
+import ahocorasick
+from collections import deque
+from itertools import islice
+from typing import Deque, FrozenSet, List, AsyncGenerator, Optional, Tuple
+from app.models.thought_node import ThoughtNode, ThoughtType
 from app.utils.text_analysis import (
     extract_keywords,
     calculate_confidence,
     detect_linguistic_cues,
-    count_shared_keywords
+    count_shared_keywords,
+    CUE_THIS,
+    CUE_THAT,
+    CUE_THEREFORE,
+    CUE_SINCE,
+    CUE_BECAUSE,
 )
 
+# Cues that refer back to the previous thought
+_REFERENTIAL_CUES = CUE_THIS | CUE_THAT | CUE_THEREFORE | CUE_SINCE | CUE_BECAUSE
+
+# Paragraph breaks or sentence endings, compiled once for every chunk parse
+_SEGMENT_BOUNDARY_RE = re.compile(r'(?:\n\s*\n+)|(?:[.!?]+\s+)')
+
+# Keyword patterns per thought type (substring matches on lowercased text),
+# listed in tie-break order for when several types score the same
+_KW_BY_TYPE: Tuple[Tuple[ThoughtType, FrozenSet[str]], ...] = (
+    (ThoughtType.IMPLEMENTATION, frozenset({
+        'implement', 'code', 'function', 'class', 'def',
+        'create', 'build', 'write', 'develop', 'construct'
+    })),
+    (ThoughtType.VERIFICATION, frozenset({
+        'check', 'verify', 'confirm', 'ensure', 'test',
+        'validate', 'prove', 'demonstrate', 'show that'
+    })),
+    (ThoughtType.DECISION, frozenset({
+        'will use', 'best approach', 'should', 'choose',
+        'decide', 'select', 'opt for', 'go with', 'prefer'
+    })),
+    (ThoughtType.ALTERNATIVE, frozenset({
+        'alternatively', 'another option', 'could also', 'or',
+        'instead', 'different approach', 'other way', 'else'
+    })),
+    (ThoughtType.ANALYSIS, frozenset({
+        'need to', 'first', "let's", 'consider', 'analyze',
+        'understand', 'examine', 'look at', 'review', 'assess'
+    })),
+)
+
+_TYPE_PRIORITY = tuple(thought_type for thought_type, _ in _KW_BY_TYPE)
+
+
+def _build_keyword_automaton() -> ahocorasick.Automaton:
+    """Build one Aho-Corasick automaton over every thought type keyword."""
+    automaton = ahocorasick.Automaton()
+    for type_index, (_, keywords) in enumerate(_KW_BY_TYPE):
+        for keyword in keywords:
+            automaton.add_word(keyword, (type_index, keyword))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
 
 class ThinkingParser:
     """Parser to convert raw thinking text into structured thought nodes."""
@@ -22,7 +76,7 @@ class ThinkingParser:
         """
         self.session_id = session_id
         self.node_counter = 0
-        self.recent_nodes: List[ThoughtNode] = []  # Keep last 5 nodes for dependency detection
+        self.recent_nodes: Deque[ThoughtNode] = deque(maxlen=5)  # Keep last 5 nodes for dependency detection
         self.x_position = 0
         self.y_position = 0
         self.accumulated_text = ""
@@ -37,60 +91,33 @@ class ThinkingParser:
         self.node_counter += 1
         return f"{self.session_id}_node_{self.node_counter}"
     
-    def classify_thought_type(self, text: str) -> ThoughtType:
+    def classify_thought_type(self, text: str, text_lower: Optional[str] = None) -> ThoughtType:
         """
         Classify thought type using keyword heuristics.
         
+        Each type scores one point per distinct keyword found in the text;
+        all keywords are matched in a single pass over the text.
+        
         Args:
             text: Thought segment text
+            text_lower: Precomputed text.lower(), if the caller already has it
             
         Returns:
             ThoughtType classification
         """
-        text_lower = text.lower()
-        
-        # Analysis patterns
-        analysis_keywords = [
-            'need to', 'first', "let's", 'consider', 'analyze',
-            'understand', 'examine', 'look at', 'review', 'assess'
-        ]
-        
-        # Decision patterns
-        decision_keywords = [
-            'will use', 'best approach', 'should', 'choose',
-            'decide', 'select', 'opt for', 'go with', 'prefer'
-        ]
-        
-        # Verification patterns
-        verification_keywords = [
-            'check', 'verify', 'confirm', 'ensure', 'test',
-            'validate', 'prove', 'demonstrate', 'show that'
-        ]
-        
-        # Alternative patterns
-        alternative_keywords = [
-            'alternatively', 'another option', 'could also', 'or',
-            'instead', 'different approach', 'other way', 'else'
-        ]
-        
-        # Implementation patterns
-        implementation_keywords = [
-            'implement', 'code', 'function', 'class', 'def',
-            'create', 'build', 'write', 'develop', 'construct'
-        ]
-        
-        # Count matches for each type
-        scores = {
-            ThoughtType.IMPLEMENTATION: sum(1 for kw in implementation_keywords if kw in text_lower),
-            ThoughtType.VERIFICATION: sum(1 for kw in verification_keywords if kw in text_lower),
-            ThoughtType.DECISION: sum(1 for kw in decision_keywords if kw in text_lower),
-            ThoughtType.ALTERNATIVE: sum(1 for kw in alternative_keywords if kw in text_lower),
-            ThoughtType.ANALYSIS: sum(1 for kw in analysis_keywords if kw in text_lower),
-        }
-        
-        # Return type with highest score, default to ANALYSIS
-        max_type = max(scores.items(), key=lambda x: x[1])
-        return max_type[0] if max_type[1] > 0 else ThoughtType.ANALYSIS
+        if text_lower is None:
+            text_lower = text.lower()
+        
+        # Distinct (type index, keyword) pairs present anywhere in the text
+        matched = {value for _, value in _KEYWORD_AUTOMATON.iter(text_lower)}
+        
+        scores = [0] * len(_TYPE_PRIORITY)
+        for type_index, _ in matched:
+            scores[type_index] += 1
+        
+        # Return type with highest score (ties go to the earlier type), default to ANALYSIS
+        best = max(range(len(scores)), key=scores.__getitem__)
+        return _TYPE_PRIORITY[best] if scores[best] > 0 else ThoughtType.ANALYSIS
     
     def split_into_segments(self, text: str, min_words: int = 4) -> List[str]:
         """
@@ -105,10 +132,14 @@ class ThinkingParser:
         """
         # Split by double line breaks (paragraph boundaries) OR sentence endings
         # This creates more coherent segments
-        sentences = re.split(r'(?:\n\s*\n+)|(?:[.!?]+\s+)', text)
+        sentences = _SEGMENT_BOUNDARY_RE.split(text)
         
         segments = []
-        current_segment = ""
+        
+        # Pieces of the current segment and its running word count, so the
+        # growing segment is neither re-concatenated nor re-split per sentence
+        parts: List[str] = []
+        word_count = 0
         
         for sentence in sentences:
             sentence = sentence.strip()
@@ -116,34 +147,34 @@ class ThinkingParser:
                 continue
             
             # Add to current segment
-            if current_segment:
+            if parts:
                 # Add proper punctuation between sentences
-                if not current_segment.endswith(('.', '!', '?', ':')):
-                    current_segment += ". "
+                if not parts[-1].endswith(('.', '!', '?', ':')):
+                    parts.append(". ")
                 else:
-                    current_segment += " "
-                current_segment += sentence
-            else:
-                current_segment = sentence
+                    parts.append(" ")
+            parts.append(sentence)
+            word_count += len(sentence.split())
             
             # Check if we have enough words for a complete thought
-            word_count = len(current_segment.split())
             if word_count >= min_words:
-                segments.append(current_segment)
-                current_segment = ""
+                segments.append("".join(parts))
+                parts.clear()
+                word_count = 0
         
         # Add remaining text if substantial (at least half the minimum)
-        if current_segment and len(current_segment.split()) >= min_words // 2:
-            segments.append(current_segment)
+        if parts and word_count >= min_words // 2:
+            segments.append("".join(parts))
         
         return segments
     
-    def detect_dependencies(self, node: ThoughtNode) -> List[str]:
+    def detect_dependencies(self, node: ThoughtNode, text_lower: Optional[str] = None) -> List[str]:
         """
         Detect dependencies on previous nodes.
         
         Args:
             node: Current thought node
+            text_lower: Precomputed node.content.lower(), if the caller already has it
             
         Returns:
             List of node IDs this node depends on
@@ -151,17 +182,16 @@ class ThinkingParser:
         dependencies = []
         
         # Check linguistic cues
-        cues = detect_linguistic_cues(node.content)
+        cues = detect_linguistic_cues(node.content, text_lower=text_lower)
         
         # If we have referential cues, link to previous node
-        if (cues['has_this'] or cues['has_that'] or cues['has_therefore'] or 
-            cues['has_since'] or cues['has_because']):
+        if cues & _REFERENTIAL_CUES:
             if self.recent_nodes:
                 dependencies.append(self.recent_nodes[-1].id)
         
         # Check for shared keywords with recent nodes
-        for recent_node in self.recent_nodes[-3:]:  # Check last 3 nodes
-            shared_count = count_shared_keywords(node.keywords, recent_node.keywords)
+        for recent_node in islice(self.recent_nodes, max(len(self.recent_nodes) - 3, 0), None):  # Check last 3 nodes
+            shared_count = count_shared_keywords(node._keyword_set, recent_node._keyword_set)
             if shared_count >= 2:  # 2+ shared keywords
                 if recent_node.id not in dependencies:
                     dependencies.append(recent_node.id)
@@ -172,23 +202,28 @@ class ThinkingParser:
         
         return dependencies
     
-    def generate_position(self) -> Position:
+    def generate_position(self) -> Tuple[float, float]:
         """
         Generate default position - D3 will calculate actual positions.
         """
         
         # Return center position - D3-force will handle layout
-        return Position(x=0, y=0, z=0)
+        return 0.0, 0.0
     
-    async def parse_incremental(self, text_chunk: str) -> AsyncGenerator[ThoughtNode, None]:
+    def parse_incremental_sync(self, text_chunk: str) -> List[ThoughtNode]:
         """
         Parse thinking text incrementally as chunks arrive.
         
+        This is plain CPU work, so callers on the event loop can run it in a
+        worker thread. The parser keeps per-session state and is not
+        thread-safe: calls for one parser must not overlap, though parsers
+        for different sessions can run concurrently.
+        
         Args:
             text_chunk: New chunk of thinking text
             
-        Yields:
-            ThoughtNode objects as they are parsed
+        Returns:
+            ThoughtNode objects completed by this chunk
         """
         # Accumulate text
         self.accumulated_text += text_chunk
@@ -197,28 +232,64 @@ class ThinkingParser:
         segments = self.split_into_segments(self.accumulated_text)
         
         # Process complete segments more aggressively
-        if len(segments) >= 1:
-            # If we have 2+ segments, process all but the last (which might be incomplete)
-            # If we have 1 segment and it's long enough (40+ words), consider it complete
-            if len(segments) > 1:
-                complete_segments = segments[:-1]
-                self.accumulated_text = segments[-1]  # Keep incomplete segment
-            elif len(segments) == 1 and len(self.accumulated_text.split()) > 40:
-                # Single segment but substantial - process it and clear accumulator
-                complete_segments = segments
-                self.accumulated_text = ""
-            else:
-                # Single segment but not long enough yet
-                return
+        if not segments:
+            return []
+        
+        # If we have 2+ segments, process all but the last (which might be incomplete)
+        # If we have 1 segment and it's long enough (40+ words), consider it complete
+        if len(segments) > 1:
+            complete_segments = segments[:-1]
+            self.accumulated_text = segments[-1]  # Keep incomplete segment
+        elif len(self.accumulated_text.split()) > 40:
+            # Single segment but substantial - process it and clear accumulator
+            complete_segments = segments
+            self.accumulated_text = ""
+        else:
+            # Single segment but not long enough yet
+            return []
+        
+        nodes = []
+        for segment in complete_segments:
+            try:
+                node = self._create_node_from_segment(segment)
+                if node:
+                    nodes.append(node)
+            except Exception:
+                # Skip problematic segments and continue
+                continue
+        return nodes
+    
+    def finalize_sync(self) -> List[ThoughtNode]:
+        """
+        Finalize parsing and process any remaining accumulated text.
+        
+        Same threading rules as parse_incremental_sync.
+        
+        Returns:
+            Remaining ThoughtNode objects
+        """
+        if not self.accumulated_text.strip():
+            return []
+        
+        # Process remaining text even if below minimum word count
+        try:
+            node = self._create_node_from_segment(self.accumulated_text)
+        except Exception:
+            return []
+        return [node] if node else []
+    
+    async def parse_incremental(self, text_chunk: str) -> AsyncGenerator[ThoughtNode, None]:
+        """
+        Parse thinking text incrementally as chunks arrive.
+        
+        Args:
+            text_chunk: New chunk of thinking text
             
-            for segment in complete_segments:
-                try:
-                    node = self._create_node_from_segment(segment)
-                    if node:
-                        yield node
-                except Exception as e:
-                    # Skip problematic segments and continue
-                    continue
+        Yields:
+            ThoughtNode objects as they are parsed
+        """
+        for node in self.parse_incremental_sync(text_chunk):
+            yield node
     
     async def finalize(self) -> AsyncGenerator[ThoughtNode, None]:
         """
@@ -227,14 +298,8 @@ class ThinkingParser:
         Yields:
             Remaining ThoughtNode objects
         """
-        if self.accumulated_text.strip():
-            # Process remaining text even if below minimum word count
-            try:
-                node = self._create_node_from_segment(self.accumulated_text)
-                if node:
-                    yield node
-            except Exception:
-                pass
+        for node in self.finalize_sync():
+            yield node
     
     def _create_node_from_segment(self, segment: str) -> Optional[ThoughtNode]:
         """
@@ -252,37 +317,41 @@ class ThinkingParser:
         # Generate node ID
         node_id = self.generate_node_id()
         
+        # Lowercase once and share it with every text analysis step
+        content = segment.strip()
+        content_lower = content.lower()
+        
         # Classify thought type
-        thought_type = self.classify_thought_type(segment)
+        thought_type = self.classify_thought_type(content, text_lower=content_lower)
         
         # Extract keywords
-        keywords = extract_keywords(segment)
+        keywords = extract_keywords(content, text_lower=content_lower)
         
         # Calculate confidence
-        confidence = calculate_confidence(segment)
+        confidence = calculate_confidence(content, text_lower=content_lower)
         
         # Generate position
-        position = self.generate_position()
+        pos_x, pos_y = self.generate_position()
         
         # Create node (without dependencies yet)
         node = ThoughtNode(
             id=node_id,
             type=thought_type,
-            content=segment.strip(),
+            content=content,
             confidence=confidence,
             keywords=keywords,
             dependencies=[],  # Will be filled next
-            position=position,
+            pos_x=pos_x,
+            pos_y=pos_y,
             session_id=self.session_id
         )
+        node._keyword_set = frozenset(keywords)
         
         # Detect dependencies
-        node.dependencies = self.detect_dependencies(node)
+        node.dependencies = self.detect_dependencies(node, text_lower=content_lower)
         
-        # Add to recent nodes (keep last 5)
+        # Add to recent nodes (deque drops the oldest beyond 5)
         self.recent_nodes.append(node)
-        if len(self.recent_nodes) > 5:
-            self.recent_nodes.pop(0)
         
         return node
 
@@ -1,8 +1,24 @@
 from fastapi import WebSocket
-from typing import Dict, List, Any
-import json
-from datetime import datetime
-from app.models.thought_node import WebSocketEvent
+from typing import Dict, List, Tuple, Any
+import asyncio
+from datetime import datetime, timezone
+from enum import Enum
+import orjson
+
+# Longest a single client may take to accept a frame before it is dropped
+_SEND_TIMEOUT_SECONDS = 2.0
+
+
+def _default(obj: Any) -> Any:
+    """Encode values orjson doesn't handle natively (e.g. ThoughtType)."""
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _encode(message: dict) -> str:
+    """Encode a message to a JSON text frame."""
+    return orjson.dumps(message, default=_default, option=orjson.OPT_UTC_Z).decode()
 
 
 class WebSocketManager:
@@ -12,8 +28,14 @@ class WebSocketManager:
     
     def __init__(self):
         """Initialize the WebSocket manager with empty connection tracking."""
-        # Dictionary mapping session_id to list of active WebSocket connections
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+        # Dictionary mapping session_id to an immutable tuple of active WebSocket
+        # connections; connect/disconnect swap in a new tuple (with no await in
+        # between, so the swap is atomic on the event loop) and broadcasts
+        # iterate whichever snapshot they read
+        self.active_connections: Dict[str, Tuple[WebSocket, ...]] = {}
+        
+        # Constant leading bytes of each session's new_thoughts envelope
+        self._thoughts_prefixes: Dict[str, bytes] = {}
     
     async def connect(self, session_id: str, websocket: WebSocket):
         """
@@ -25,10 +47,9 @@ class WebSocketManager:
         """
         await websocket.accept()
         
-        if session_id not in self.active_connections:
-            self.active_connections[session_id] = []
-        
-        self.active_connections[session_id].append(websocket)
+        self.active_connections[session_id] = self.active_connections.get(session_id, ()) + (websocket,)
+        if session_id not in self._thoughts_prefixes:
+            self._thoughts_prefixes[session_id] = self._build_thoughts_prefix(session_id)
         
         # Send connection confirmation
         await self.send_personal_message(
@@ -37,7 +58,7 @@ class WebSocketManager:
                 "event_type": "connected",
                 "session_id": session_id,
                 "message": "Connected to thinking stream",
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.now(timezone.utc)
             }
         )
     
@@ -49,13 +70,17 @@ class WebSocketManager:
             session_id: Session identifier
             websocket: WebSocket connection to remove
         """
-        if session_id in self.active_connections:
-            if websocket in self.active_connections[session_id]:
-                self.active_connections[session_id].remove(websocket)
-            
-            # Clean up empty session lists
-            if not self.active_connections[session_id]:
-                del self.active_connections[session_id]
+        connections = self.active_connections.get(session_id)
+        if connections is None or websocket not in connections:
+            return
+        
+        remaining = tuple(connection for connection in connections if connection is not websocket)
+        if remaining:
+            self.active_connections[session_id] = remaining
+        else:
+            # Clean up sessions with no connections left
+            del self.active_connections[session_id]
+            self._thoughts_prefixes.pop(session_id, None)
     
     async def send_personal_message(self, websocket: WebSocket, message: dict):
         """
@@ -66,7 +91,7 @@ class WebSocketManager:
             message: Message data to send
         """
         try:
-            await websocket.send_json(message)
+            await websocket.send_text(_encode(message))
         except Exception as e:
             # Connection may have closed
             pass
@@ -83,29 +108,54 @@ class WebSocketManager:
         if session_id not in self.active_connections:
             return
         
-        # Create event message
-        event = WebSocketEvent(
-            event_type=event_type,
-            session_id=session_id,
-            data=data if isinstance(data, dict) else {"content": str(data)},
-            timestamp=datetime.utcnow()
-        )
+        # Build the event envelope directly (same shape as WebSocketEvent);
+        # outbound data is ours, so it skips model validation
+        message = {
+            "event_type": event_type,
+            "session_id": session_id,
+            "data": data if isinstance(data, dict) else {"content": str(data)},
+            "timestamp": datetime.now(timezone.utc)
+        }
+        
+        # Encode once for all connections instead of once per connection
+        await self._send_to_session(session_id, _encode(message))
+    
+    async def _send_to_session(self, session_id: str, payload: str):
+        """
+        Send an encoded frame to all connections for a session.
         
-        # Convert to dict for JSON serialization
-        message = event.model_dump(mode='json')
+        Args:
+            session_id: Session identifier
+            payload: JSON text frame
+        """
+        # Send to every connection in the current snapshot concurrently; drops
+        # during the sends swap in a new tuple and leave this one untouched
+        connections = self.active_connections.get(session_id, ())
+        if not connections:
+            return
+        await asyncio.gather(
+            *(self._safe_send(session_id, connection, payload) for connection in connections)
+        )
+    
+    async def _safe_send(self, session_id: str, websocket: WebSocket, payload: str):
+        """
+        Send a frame to one connection, dropping it if the send fails or stalls.
         
-        # Send to all connections for this session
-        disconnected = []
-        for connection in self.active_connections[session_id]:
+        Args:
+            session_id: Session identifier
+            websocket: Target WebSocket connection
+            payload: JSON text frame
+        """
+        try:
+            await asyncio.wait_for(websocket.send_text(payload), _SEND_TIMEOUT_SECONDS)
+        except Exception:
+            # Closed or too slow: stop holding up the rest of the session
+            await self.disconnect(session_id, websocket)
             try:
-                await connection.send_json(message)
-            except Exception as e:
-                # Mark for removal if connection failed
-                disconnected.append(connection)
-        
-        # Clean up disconnected connections
-        for connection in disconnected:
-            await self.disconnect(session_id, connection)
+                # 1013 (try again later) lets the client reconnect
+                await asyncio.wait_for(websocket.close(code=1013), _SEND_TIMEOUT_SECONDS)
+            except Exception:
+                pass
     
     async def broadcast_new_thought(self, session_id: str, thought_node: dict):
         """
@@ -117,6 +167,35 @@ class WebSocketManager:
         """
         await self.broadcast(session_id, "new_thought", thought_node)
     
+    async def broadcast_new_thoughts_batch(self, session_id: str, thought_nodes: List[bytes]):
+        """
+        Broadcast several thought nodes as a single event.
+        
+        The nodes arrive already JSON-encoded, so the envelope is assembled
+        around them directly rather than re-encoding each node.
+        
+        Args:
+            session_id: Session identifier
+            thought_nodes: List of JSON-encoded ThoughtNode objects
+        """
+        if session_id not in self.active_connections:
+            return
+        
+        prefix = self._thoughts_prefixes.get(session_id) or self._build_thoughts_prefix(session_id)
+        payload = (
+            prefix + b','.join(thought_nodes)
+            + b']},"timestamp":' + orjson.dumps(datetime.now(timezone.utc), option=orjson.OPT_UTC_Z) + b'}'
+        )
+        await self._send_to_session(session_id, payload.decode())
+    
+    @staticmethod
+    def _build_thoughts_prefix(session_id: str) -> bytes:
+        """Build the fixed start of a session's new_thoughts envelope."""
+        return (
+            b'{"event_type":"new_thoughts","session_id":' + orjson.dumps(session_id)
+            + b',"data":{"nodes":['
+        )
+    
     async def broadcast_thinking_complete(self, session_id: str, summary: dict):
         """
         Broadcast thinking completion event.
@@ -165,7 +244,7 @@ class WebSocketManager:
         Returns:
             Number of active connections
         """
-        return len(self.active_connections.get(session_id, []))
+        return len(self.active_connections.get(session_id, ()))
     
     def has_connections(self, session_id: str) -> bool:
         """
@@ -177,7 +256,7 @@ class WebSocketManager:
         Returns:
             True if session has active connections
         """
-        return session_id in self.active_connections and len(self.active_connections[session_id]) > 0
+        return bool(self.active_connections.get(session_id))
 
 
 # Global WebSocket manager instance
@@ -1,41 +1,88 @@
 import re
-from typing import List, Dict
-from collections import Counter
+import heapq
+from operator import itemgetter
+from typing import AbstractSet, List, Dict, Optional
 
+# Candidate keywords: lowercase words of 3+ letters
+_WORD_RE = re.compile(r'\b[a-z]{3,}\b')
 
-def extract_keywords(text: str, top_n: int = 5) -> List[str]:
+# Common stop words to filter out
+_STOP_WORDS = frozenset({
+    'the', 'is', 'at', 'which', 'on', 'a', 'an', 'and', 'or', 'but',
+    'in', 'with', 'to', 'for', 'of', 'as', 'by', 'that', 'this',
+    'from', 'are', 'was', 'were', 'been', 'be', 'have', 'has', 'had',
+    'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may',
+    'might', 'can', 'it', 'its', 'they', 'them', 'their', 'we', 'our',
+    'you', 'your', 'i', 'my', 'me', 'he', 'she', 'him', 'her'
+})
+
+# Certainty indicators (increase confidence), one alternation so the text is scanned once
+_CERTAINTY_RE = re.compile(
+    r'\b(clearly|obviously|definitely|certainly|surely|must|will'
+    r'|always|never|absolutely|undoubtedly|unquestionably'
+    r'|correct|right|true|exact|precise)\b'
+)
+
+# Hedging indicators (decrease confidence)
+_HEDGING_RE = re.compile(
+    r'\b(maybe|perhaps|possibly|probably|might|could|may'
+    r'|uncertain|unsure|unclear|ambiguous|vague'
+    r'|seems|appears|suggests|indicates'
+    r'|somewhat|slightly|fairly|rather|quite'
+    r'|I think|I believe|I guess|I assume)\b'
+)
+
+# Linguistic cues that suggest a dependency on earlier thoughts, one bit each
+CUE_THEREFORE = 1 << 0
+CUE_SINCE = 1 << 1
+CUE_THIS = 1 << 2
+CUE_THAT = 1 << 3
+CUE_BECAUSE = 1 << 4
+CUE_SO = 1 << 5
+CUE_THUS = 1 << 6
+CUE_HENCE = 1 << 7
+
+_CUE_BITS = {
+    'therefore': CUE_THEREFORE,
+    'since': CUE_SINCE,
+    'this': CUE_THIS,
+    'that': CUE_THAT,
+    'because': CUE_BECAUSE,
+    'so': CUE_SO,
+    'thus': CUE_THUS,
+    'hence': CUE_HENCE,
+}
+_CUES_RE = re.compile(r'\b(' + '|'.join(_CUE_BITS) + r')\b')
+
+
+def extract_keywords(text: str, top_n: int = 5, text_lower: Optional[str] = None) -> List[str]:
     """
     Extract top keywords from text using word frequency analysis.
     
     Args:
         text: Input text to analyze
         top_n: Number of top keywords to return (default 5)
+        text_lower: Precomputed text.lower(), if the caller already has it
         
     Returns:
         List of top keywords
     """
-    # Convert to lowercase and extract words (alphanumeric only)
-    words = re.findall(r'\b[a-z]{3,}\b', text.lower())
-    
-    # Common stop words to filter out
-    stop_words = {
-        'the', 'is', 'at', 'which', 'on', 'a', 'an', 'and', 'or', 'but',
-        'in', 'with', 'to', 'for', 'of', 'as', 'by', 'that', 'this',
-        'from', 'are', 'was', 'were', 'been', 'be', 'have', 'has', 'had',
-        'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may',
-        'might', 'can', 'it', 'its', 'they', 'them', 'their', 'we', 'our',
-        'you', 'your', 'i', 'my', 'me', 'he', 'she', 'him', 'her'
-    }
-    
-    # Filter stop words and count frequencies
-    filtered_words = [w for w in words if w not in stop_words]
-    word_counts = Counter(filtered_words)
-    
-    # Return top N keywords
-    return [word for word, count in word_counts.most_common(top_n)]
+    if text_lower is None:
+        text_lower = text.lower()
+    
+    # Count non-stop words in a single pass over the lowercased text
+    word_counts: Dict[str, int] = {}
+    for match in _WORD_RE.finditer(text_lower):
+        word = match.group()
+        if word in _STOP_WORDS:
+            continue
+        word_counts[word] = word_counts.get(word, 0) + 1
+    
+    # Return top N keywords (ties keep first-seen order, as most_common did)
+    return [word for word, _ in heapq.nlargest(top_n, word_counts.items(), key=itemgetter(1))]
 
 
-def calculate_confidence(text: str) -> float:
+def calculate_confidence(text: str, text_lower: Optional[str] = None) -> float:
     """
     Calculate confidence score based on language patterns.
     
@@ -43,42 +90,20 @@ def calculate_confidence(text: str) -> float:
     
     Args:
         text: Input text to analyze
+        text_lower: Precomputed text.lower(), if the caller already has it
         
     Returns:
         Confidence score between 0.0 and 1.0
     """
-    text_lower = text.lower()
-    
-    # Certainty indicators (increase confidence)
-    certainty_patterns = [
-        r'\b(clearly|obviously|definitely|certainly|surely|must|will)\b',
-        r'\b(always|never|absolutely|undoubtedly|unquestionably)\b',
-        r'\b(correct|right|true|exact|precise)\b'
-    ]
-    
-    # Hedging indicators (decrease confidence)
-    hedging_patterns = [
-        r'\b(maybe|perhaps|possibly|probably|might|could|may)\b',
-        r'\b(uncertain|unsure|unclear|ambiguous|vague)\b',
-        r'\b(seems|appears|suggests|indicates)\b',
-        r'\b(somewhat|slightly|fairly|rather|quite)\b',
-        r'\b(I think|I believe|I guess|I assume)\b'
-    ]
+    if text_lower is None:
+        text_lower = text.lower()
     
     # Question marks indicate uncertainty
     question_marks = text.count('?')
     
-    # Count certainty indicators
-    certainty_count = sum(
-        len(re.findall(pattern, text_lower))
-        for pattern in certainty_patterns
-    )
-    
-    # Count hedging indicators
-    hedging_count = sum(
-        len(re.findall(pattern, text_lower))
-        for pattern in hedging_patterns
-    )
+    # Count certainty and hedging indicators
+    certainty_count = len(_CERTAINTY_RE.findall(text_lower))
+    hedging_count = len(_HEDGING_RE.findall(text_lower))
     
     # Base confidence
     base_confidence = 0.7
@@ -93,40 +118,37 @@ def calculate_confidence(text: str) -> float:
     return max(0.0, min(1.0, confidence))
 
 
-def detect_linguistic_cues(text: str) -> Dict[str, bool]:
+def detect_linguistic_cues(text: str, text_lower: Optional[str] = None) -> int:
     """
     Detect linguistic cues that indicate relationships or dependencies.
     
     Args:
         text: Input text to analyze
+        text_lower: Precomputed text.lower(), if the caller already has it
         
     Returns:
-        Dictionary of detected cues and their presence
+        Bitmask of CUE_* flags for the cues present in the text
     """
-    text_lower = text.lower()
-    
-    return {
-        'has_therefore': bool(re.search(r'\btherefore\b', text_lower)),
-        'has_since': bool(re.search(r'\bsince\b', text_lower)),
-        'has_this': bool(re.search(r'\bthis\b', text_lower)),
-        'has_that': bool(re.search(r'\bthat\b', text_lower)),
-        'has_because': bool(re.search(r'\bbecause\b', text_lower)),
-        'has_so': bool(re.search(r'\bso\b', text_lower)),
-        'has_thus': bool(re.search(r'\bthus\b', text_lower)),
-        'has_hence': bool(re.search(r'\bhence\b', text_lower)),
-    }
+    if text_lower is None:
+        text_lower = text.lower()
+    
+    # Single pass over the text for all cue words
+    cues = 0
+    for match in _CUES_RE.finditer(text_lower):
+        cues |= _CUE_BITS[match.group(1)]
+    return cues
 
 
-def count_shared_keywords(keywords1: List[str], keywords2: List[str]) -> int:
+def count_shared_keywords(keywords1: AbstractSet[str], keywords2: AbstractSet[str]) -> int:
     """
-    Count the number of shared keywords between two lists.
+    Count the number of shared keywords between two keyword sets.
     
     Args:
-        keywords1: First list of keywords
-        keywords2: Second list of keywords
+        keywords1: First set of keywords
+        keywords2: Second set of keywords
         
     Returns:
         Number of shared keywords
     """
-    return len(set(keywords1) & set(keywords2))
+    return len(keywords1 & keywords2)
 
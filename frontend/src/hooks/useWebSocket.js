@@ -74,6 +74,14 @@ export function useWebSocket({
                 }
                 break
 
+              case 'new_thoughts':
+                if (onNewThought && data.data && Array.isArray(data.data.nodes)) {
+                  data.data.nodes.forEach((node) => onNewThought(node))
+                } else {
+                  console.error('✗ new_thoughts event missing nodes:', data)
+                }
+                break
+
               case 'thinking_complete':
                 if (onThinkingComplete) {
                   onThinkingComplete(data.data)